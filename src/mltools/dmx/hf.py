@@ -1,24 +1,36 @@
+from collections.abc import Sequence
 from typing import Optional, Dict
+from functools import lru_cache, partial
 from transformers import pipeline as hfpipeline
+from mltools import dmx
 from mltools.fx.transform import substitute_transform
 import transformers
-from .model import DmxModelMixin, DmxConfig
-import evaluate
-from evaluate import evaluator
-from datasets import load_dataset
-from huggingface_hub import hf_hub_download
-from .model import DmxModel, DmxConfig
+from .model import DmxModel, DmxModelMixin, DmxConfig
 from tqdm import tqdm
 import torch
 
 
+@lru_cache(maxsize=128)
+def _download_config_file(repo_name, revision, config_name):
+    # NOTE: datasets, evaluate and huggingface_hub are imported where used to keep `import mltools` light
+    from huggingface_hub import hf_hub_download
+
+    # NOTE: memoized per process; hf_hub_download itself resolves moving revisions against the Hub,
+    # serves cached commit-hash revisions without a request, and falls back to the local cache when offline
+    return str(
+        hf_hub_download(
+            repo_id=repo_name,
+            filename=f"configs/{config_name}.yaml",
+            revision=revision,
+        )
+    )
+
+
 def get_config_file(repo_name, revision, config_name):
     if config_name in ["BASELINE", "BASIC"]:
         return None
     try:
-        return hf_hub_download(
-            repo_id=repo_name, filename=f"configs/{config_name}.yaml", revision=revision
-        )
+        return _download_config_file(repo_name, revision, config_name)
     except Exception as e:
         print(f"Failed to download the file: {str(e)}")
         return None
@@ -31,33 +43,58 @@ def dmx_transform(pipe, dmx_config_name):
         pipe.model.configure(config)
     else:
         if dmx_config_name in ["BASELINE", "BASIC"]:
-            from . import config_rules
-
             # NOTE: assuming pipe.model is in BASELINE mode
-            pipe.model.configure(None, *eval(f"config_rules.{dmx_config_name}"))
+            pipe.model.configure(None, *getattr(dmx.config_rules, dmx_config_name))
         else:
             raise RuntimeError(f"illegal dmx_config: {dmx_config_name}")
 
 
+dataset_column_mapping = {
+    "wikitext": "text",
+    "ptb_text_only": "sentence",
+    "lambada": "text",
+    "EleutherAI/lambada_openai": "text",
+    # Add more datasets and their respective column names here
+}
+
+
+class DatasetColumn(Sequence):
+    r"""
+    A read-only view of a dataset column, so that the column is not copied into a list up front.
+    Iteration decodes batch_size rows at a time, and only the column of interest is decoded.
+    NOTE: this only avoids the up-front copy, consumers may still materialize the column,
+    e.g. evaluate's Metric.compute encodes all references into a single batch.
+    """
+
+    def __init__(self, dataset, key, batch_size=32):
+        self.dataset = dataset.select_columns(key)
+        self.key = key
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, i):
+        return self.dataset[i][self.key]
+
+    def __iter__(self):
+        for i in range(0, len(self), self.batch_size):
+            yield from self.dataset[i : i + self.batch_size][self.key]
+
+
 def prepare_dataset_and_column(
     dataset, column_name=None, dataset_version=None, dataset_split="test", seed=42, trust_remote_code=True
 ):
-    dataset_column_mapping = {
-        "wikitext": "text",
-        "ptb_text_only": "sentence",
-        "lambada": "text",
-        "EleutherAI/lambada_openai": "text",
-        # Add more datasets and their respective column names here
-    }
-
     if dataset == "squad":
         column_name = None
-    elif not column_name and dataset in dataset_column_mapping:
-        column_name = dataset_column_mapping[dataset]
     elif not column_name:
-        raise ValueError(
-            f"Column name not found for dataset '{dataset}'. Please provide the column_name."
-        )
+        column_name = dataset_column_mapping.get(dataset)
+        if column_name is None:
+            raise ValueError(
+                f"Column name not found for dataset '{dataset}'. Please provide the column_name."
+            )
+
+    from datasets import load_dataset
 
     dataset = load_dataset(dataset, dataset_version, split=dataset_split, trust_remote_code=trust_remote_code)
     if dataset_split == "train":
@@ -141,6 +178,8 @@ def eval_question_answering(
     dataset, column_name = prepare_dataset_and_column(
         dataset, column_name, dataset_version, dataset_split
     )
+    from evaluate import evaluator
+
     task_evaluator = evaluator("question-answering")
     results = task_evaluator.compute(
         model_or_pipeline=model, tokenizer=tokenizer, data=dataset
@@ -157,18 +196,21 @@ def eval_text_generation(
     revision="main",
     column_name=None,
     dataset_version=None,
+    batch_size=32,
 ):
     dataset, column_name = prepare_dataset_and_column(
         dataset, column_name, dataset_version, dataset_split
     )
 
+    import evaluate
+
     metric = evaluate.load(metric, module_type="metric")
 
     results = metric.compute(
         model=model,
         tokenizer=tokenizer,
         revision=revision,
-        references=dataset[column_name],
+        references=DatasetColumn(dataset, column_name, batch_size),
     )
     return results
 
@@ -183,9 +225,10 @@ def pipe_eval(
     dataset_split="test",
     column_name=None,
     dataset_version=None,
+    batch_size=32,
 ):
     task_eval_mapping = {
-        "text-generation": eval_text_generation,
+        "text-generation": partial(eval_text_generation, batch_size=batch_size),
         "question-answering": eval_question_answering,
     }
 
@@ -235,7 +278,7 @@ def pipeline(
     pipe.model = DmxModel.from_torch(
         pipe.model, get_input_filter_rules(pipe.model_name)
     )
-    pipe.evaluate = lambda metric, dataset, column_name=None, dataset_version=None, dataset_split="test": pipe_eval(
+    pipe.evaluate = lambda metric, dataset, column_name=None, dataset_version=None, dataset_split="test", batch_size=32: pipe_eval(
         pipe.model,
         pipe.tokenizer,
         dataset,
@@ -245,6 +288,7 @@ def pipeline(
         dataset_split,
         column_name,
         dataset_version,
+        batch_size,
     )
 
     pipe.do_forward_on = lambda dataset, column_name=None, dataset_version=None, dataset_split="test", num_samples=None, seed=42: do_forward_on(
@@ -264,8 +308,33 @@ def pipeline(
 
 
 class DmxPreTrainedModel(transformers.modeling_utils.PreTrainedModel, DmxModelMixin):
+    _dmx_enable_handle: Optional[torch.utils.hooks.RemovableHandle] = None
+
     @classmethod
     def from_pretrained(cls, *args, **kwargs):
         _model = super().from_pretrained(*args, **kwargs)
-        _model.base_model = substitute_transform(_model.base_model, hf=True)
+        # NOTE: FX transformation is deferred to the first forward or dmx_enable();
+        # a pre-hook leaves forward itself, e.g. as wrapped by accelerate for device_map, and its signature untouched
+        _model._dmx_enable_handle = _model.register_forward_pre_hook(
+            DmxPreTrainedModel._lazy_dmx_enable
+        )
         return _model
+
+    @staticmethod
+    def _lazy_dmx_enable(module, args):
+        module.dmx_enable()
+
+    def dmx_enable(self):
+        """
+        A function that applies the pending FX transformation of the model, if any.
+
+        Returns:
+            Returns the transformed model
+        """
+        if self._dmx_enable_handle is not None:
+            self.base_model = substitute_transform(self.base_model, hf=True)
+            # NOTE: only settled once tracing succeeded, so that a failed trace is retried rather than skipped
+            self._dmx_enable_handle.remove()
+            self._dmx_enable_handle = None
+            self._invalidate_dmx_module_list()
+        return self
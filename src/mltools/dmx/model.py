@@ -1,17 +1,55 @@
+import os
+import warnings
 import torch
 import re
 from collections import deque, OrderedDict
 from inspect import signature, _empty
-from types import SimpleNamespace
 from contextlib import ExitStack, contextmanager
 from typing import Any, Dict, Optional, Union, Sequence, get_args, get_origin
 from functools import partial
-from mltools import dmx
+from mltools import dmx, utils
 from mltools.dmx.nn import *
 from mltools.fx.transform import substitute_transform
 from mltools.fx.transformer import get_op_set_from
 import functools
 
+try:
+    import re2
+except ModuleNotFoundError:
+    re2 = None
+
+
+def _compile(name_re: str):
+    r"""
+    Compiles a module name pattern, with RE2 (linear-time matching) if available and the pattern is supported by it
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(name_re)
+        except re2.error:  # e.g. backreferences and lookarounds
+            pass
+    return re.compile(name_re)
+
+
+def _iter_dmx(root: torch.nn.Module):
+    r"""
+    Yields (name, module) of dmx configurable submodules of root, in the same pre-order as named_modules(), with an explicit stack instead of recursive generators
+    """
+    memo = set()
+    stack = [("", root)]
+    while stack:
+        name, m = stack.pop()
+        if m in memo:
+            continue
+        memo.add(m)
+        if is_configurable(m):
+            yield name, m
+        stack.extend(
+            (f"{name}.{cn}" if name else cn, cm)
+            for cn, cm in reversed(m._modules.items())
+            if cm is not None
+        )
+
 
 class DmxModelMixin:
     transformed: bool = False
@@ -59,16 +97,25 @@ class DmxModelMixin:
     @property
     def dmx_config(self):
         r""" "Returns the DmxConfig object for the model"""
+        # NOTE: read live, so that changes made directly on individual modules are reflected
         return DmxConfig.from_model(self, freeze=True)
 
+    def _invalidate_dmx_module_list(self):
+        self.__dict__.pop("_dmx_module_list", None)
+
     @property
     def dmx_module_names(self):
         r""" "Returns a list of module names listed in a dmx_config"""
         return self.dmx_config.module_names
 
+    @functools.cached_property
+    def _dmx_module_list(self):
+        # NOTE: cached until the model is retraced
+        return list(_iter_dmx(self))
+
     def named_dmx_modules(self):
         r""" "Returns a list of named modules that are dmx configurable"""
-        return ((n, m) for n, m in self.named_modules() if is_configurable(m))
+        return iter(self._dmx_module_list)
 
     def freeze(self, config_file="./config.yaml"):
         """
@@ -95,15 +142,13 @@ class DmxModelMixin:
         Args:
             include_type (bool): include the type of modules in the print out if True
         """
-        from mltools.utils import print_model_tree
-
-        print_model_tree(self, include_type)
+        utils.print_model_tree(self, include_type)
 
     def fold_weights_and_biases(self):
         """
         A function that applies the ops the weights and biases using the corresponding formats.
         """
-        for _, m in self.named_dmx_modules():
+        for _, m in self._dmx_module_list:
             m.fold_weight_and_bias()
 
     def check_dim_consistency(self) -> bool:
@@ -115,21 +160,25 @@ class DmxModelMixin:
         """
         return all(
             m.check_format_dim_consistency() and m.check_sparseness_dim_consistency()
-            for _, m in self.named_dmx_modules()
+            for _, m in self._dmx_module_list
         )
 
     @contextmanager
     def keep_dmx_config(self):
-        _dmx_config = self.dmx_config
-        yield self
-        self.configure(_dmx_config)
+        _snapshots = {n: m.snapshot_format() for n, m in self._dmx_module_list}
+        try:
+            yield self
+        finally:
+            for n, m in self._dmx_module_list:
+                if n in _snapshots:
+                    m.restore_format(_snapshots[n])
 
     @contextmanager
     def counting_flops(self, zero: bool = True):
         with ExitStack() as stack:
             yield [
                 stack.enter_context(m.counting_flops(zero))
-                for _, m in self.named_dmx_modules()
+                for _, m in self._dmx_module_list
             ]
 
     @staticmethod
@@ -149,7 +198,7 @@ class DmxModelMixin:
         **hyperparams,
     ):
         if specific_layers is None:
-            specific_layers = self.named_dmx_modules()
+            specific_layers = self._dmx_module_list
         for _, _m in specific_layers:
             _m.set_weight_calibrator(**hyperparams)
         with torch.no_grad(), ExitStack() as stack:
@@ -168,7 +217,7 @@ class DmxModelMixin:
         **hyperparams,
     ):
         if specific_layers is None:
-            specific_layers = self.named_dmx_modules()
+            specific_layers = self._dmx_module_list
         for _, _m in specific_layers:
             _m.set_activation_calibrator(**hyperparams)
         with torch.no_grad(), ExitStack() as stack:
@@ -188,7 +237,7 @@ class DmxModelMixin:
         **hyperparams,
     ):
         if specific_layers is None:
-            specific_layers = self.named_dmx_modules()
+            specific_layers = self._dmx_module_list
         for _, _m in specific_layers:
             _m.set_smoothquant_params(**hyperparams)
         with torch.no_grad(), ExitStack() as stack:
@@ -208,7 +257,7 @@ class DmxModelMixin:
         **hyperparams,
     ):
         if specific_layers is None:
-            specific_layers = self.named_dmx_modules()
+            specific_layers = self._dmx_module_list
         with torch.no_grad(), ExitStack() as stack:
             yield [
                 stack.enter_context(m.optimal_brain_compressing(**hyperparams))
@@ -247,17 +296,48 @@ class DmxModel(torch.nn.Module):
         DmxModel().post_process_gm(_model, kwargs)
 
         _model._output_cls = _output_cls
+        _gm_forward = DmxModel._maybe_compiled(_model._gm.forward)
         _forward = (
-            (
-                lambda *_args, **_kwargs: _output_cls(
-                    **(_model._gm.forward(*_args, **_kwargs))
-                )
-            )
+            (lambda *_args, **_kwargs: _output_cls(**_gm_forward(*_args, **_kwargs)))
             if _model._output_cls is not None
-            else _model._gm.forward
+            else _gm_forward
         )
         return _forward
 
+    @staticmethod
+    def _maybe_compiled(_forward):
+        r"""
+        Wraps the forward of a transformed GraphModule with torch.compile, if opted in by environment variable DMX_COMPILE=1 and CUDA is available.
+        Falls back to eager for good if Dynamo/Inductor fails to compile, e.g. on data-dependent control flow of remote code;
+        any other error, e.g. of shapes or memory, is raised as is and leaves compilation on.
+        """
+        if (
+            os.environ.get("DMX_COMPILE", "0") != "1"
+            or not torch.cuda.is_available()
+            or not hasattr(torch, "compile")
+        ):
+            return _forward
+        from torch._dynamo.exc import TorchDynamoException, TorchRuntimeError
+
+        _compiled_forward = torch.compile(_forward, mode="reduce-overhead", dynamic=True)
+
+        def _forward_or_eager(*_args, **_kwargs):
+            nonlocal _compiled_forward
+            if _compiled_forward is not None:
+                try:
+                    return _compiled_forward(*_args, **_kwargs)
+                except TorchRuntimeError:
+                    raise  # NOTE: a genuine runtime error surfaced while tracing, eager would fail too
+                except TorchDynamoException as e:
+                    warnings.warn(
+                        f"torch.compile failed, falling back to eager: {str(e)}",
+                        RuntimeWarning,
+                    )
+                    _compiled_forward = None
+            return _forward(*_args, **_kwargs)
+
+        return _forward_or_eager
+
     @staticmethod
     def is_same_signature(_model, kwargs):
         tracing_kwargs = _model.tracing_kwargs
@@ -265,14 +345,14 @@ class DmxModel(torch.nn.Module):
         if tracing_kwargs.keys() != kwargs.keys():
             return False
         # comparing kwargs values between tracing kwarg and new kwargs
-        for k in kwargs.keys():
-            # if bool argument has different values, need to retrace
-            if isinstance(kwargs[k], bool) and kwargs[k] != tracing_kwargs[k]:
-                return False
+        for k, v in kwargs.items():
+            _v = tracing_kwargs[k]
+            if isinstance(v, bool):
+                # if bool argument has different values, need to retrace
+                if v != _v:
+                    return False
             # if one in None and other is not none, need to retrace
-            if not isinstance(kwargs[k], bool) and (kwargs[k] is None) != (
-                tracing_kwargs[k] is None
-            ):
+            elif (v is None) != (_v is None):
                 return False
         return True
 
@@ -337,6 +417,8 @@ class DmxModel(torch.nn.Module):
 
                     if _m.transformed:
                         curr_cfg = _m.dmx_config
+                    # NOTE: drop the module list before retracing, it refers to the previous transformed modules
+                    _m._invalidate_dmx_module_list()
                     print("triggering transform")
                     _m.tracing_kwargs = _kwargs.copy()
                     _m._forward = DmxModel._get_transformed_forward(_m, _args, _kwargs)
@@ -392,9 +474,7 @@ class DmxConfig(dict):
         Returns:
             A DmxConfig object vreated from yaml file
         """
-        from mltools.utils import load_config_file
-
-        return cls(load_config_file(fname))
+        return cls(utils.load_config_file(fname))
 
     def to_yaml(self, fname):
         """
@@ -403,9 +483,7 @@ class DmxConfig(dict):
         Args:
             fname (str): file path of the yaml file
         """
-        from mltools.utils import save_config_file
-
-        save_config_file(dict(self), fname)
+        utils.save_config_file(dict(self), fname)
 
     @property
     def module_names(self):
@@ -414,8 +492,23 @@ class DmxConfig(dict):
         """
         return self.keys()
 
+    def apply_rules(self, *rules):
+        """
+        A convenience function that applies configuration rules to the DmxConfig one after another,
+        same as calling rule.apply_to(config) for each rule; every rule still matches every module name
+
+        Args:
+            *rules (List[DmxConfigRule]): variable length of list of configuration rules, applied in order.
+
+        Returns:
+            the updated DmxConfig object
+        """
+        for _r in rules:
+            _r.apply_to(self)
+        return self
+
 
-class DmxConfigRule(SimpleNamespace):
+class DmxConfigRule:
     r"""
     This is a rule that specifies how to transform from DmxConfig to DmxConfig
     This defines the 'action' in the state space
@@ -431,6 +524,8 @@ class DmxConfigRule(SimpleNamespace):
         module_config (DmxModuleConfig): DmxModuleConfig that specifies the ops formats for a module.
     """
 
+    __slots__ = ("module_types", "name_rule", "module_config")
+
     def __init__(
         self,
         module_types=(),
@@ -439,9 +534,15 @@ class DmxConfigRule(SimpleNamespace):
     ) -> None:
         assert all([issubclass(mt, DmxModule) for mt in module_types])
         self.module_types = module_types
-        self.name_rule = re.compile(name_re)
+        self.name_rule = _compile(name_re)
         self.module_config = module_config
 
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(module_types={self.module_types!r}, "
+            f"name_rule={self.name_rule!r}, module_config={self.module_config!r})"
+        )
+
     def names_in(self, model_or_config: Union[torch.nn.Module, DmxConfig]):
         """
         Creates a list of module names where the modules are in self.module_types and the names match with self.name_rule.
@@ -452,11 +553,13 @@ class DmxConfigRule(SimpleNamespace):
         Returns:
             A list of module names
         """
-        config = (
-            model_or_config
-            if isinstance(model_or_config, DmxConfig)
-            else DmxConfig.from_model(model_or_config, freeze=True)
-        )
+        if isinstance(model_or_config, torch.nn.Module):
+            return [
+                n
+                for n, m in model_or_config.named_dmx_modules()
+                if type(m) in self.module_types and self.name_rule.match(n)
+            ]
+        config = model_or_config
         return [
             n
             for n in config.module_names
@@ -471,17 +574,13 @@ class DmxConfigRule(SimpleNamespace):
         Args:
             model_or_config (Union[Model, DmxConfig]): Model or DmxConfig to apply transformation on.
         """
-        target_module_names = self.names_in(model_or_config)
         if isinstance(model_or_config, torch.nn.Module):
             for n, m in model_or_config.named_dmx_modules():
-                if n in target_module_names and type(m) in self.module_types:
+                if type(m) in self.module_types and self.name_rule.match(n):
                     m.configure(self.module_config)
         else:
             config = model_or_config
-            for n in (
-                target_module_names
-                and getattr(dmx.nn, config[n]["instance"]) in self.module_types
-            ):
+            for n in self.names_in(config):
                 config[n].update(self.module_config)
 
 
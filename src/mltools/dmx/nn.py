@@ -97,6 +97,71 @@ class DmxModule(
 
     transform = configure  # NOTE: to be deprecated
 
+    def snapshot_format(self) -> tuple:
+        """
+        A function that takes a snapshot of the ops formats and state dict url of the module, which is cheaper than a frozen DmxModuleConfig.
+
+        Returns:
+            An opaque tuple to be passed to restore_format()
+        """
+        return (
+            self.input_format,
+            self.output_format,
+            self.residual_format,
+            self.multiplier_format,
+            self.accum_format,
+            self.weight_format,
+            self.bias_format,
+            (
+                self.smoothquant.scale_cast.format
+                if self.smoothquant is not None
+                else None
+            ),
+            self.weight_sparseness,
+            self.approximation_function,
+            self.state_dict_url,
+        )
+
+    def restore_format(self, snapshot: tuple) -> None:
+        """
+        A function that restores the ops formats and state dict of the module from a snapshot taken by snapshot_format().
+
+        Args:
+            snapshot (tuple): snapshot of the ops formats
+        """
+        (
+            input_format,
+            output_format,
+            residual_format,
+            multiplier_format,
+            accum_format,
+            weight_format,
+            bias_format,
+            smoothquant_scale_format,
+            weight_sparseness,
+            approximation_function,
+            state_dict_url,
+        ) = snapshot
+        self.input_cast.set_format(format=input_format)
+        self.output_cast.set_format(format=output_format)
+        if self.residual_cast is not None and residual_format is not None:
+            self.residual_cast.set_format(format=residual_format)
+        if self.multiplier_cast is not None and multiplier_format is not None:
+            self.multiplier_cast.set_format(format=multiplier_format)
+        if self.accum_cast is not None and accum_format is not None:
+            self.accum_cast.set_format(format=accum_format)
+        if self.weight_cast is not None and weight_format is not None:
+            self.weight_cast.set_format(format=weight_format)
+        if self.bias_cast is not None and bias_format is not None:
+            self.bias_cast.set_format(format=bias_format)
+        if self.smoothquant is not None and smoothquant_scale_format is not None:
+            self.smoothquant.set_scale_format(format=smoothquant_scale_format)
+        if self.weight_sparsifier is not None and weight_sparseness is not None:
+            self.weight_sparsifier.configure(sparseness=weight_sparseness)
+        self.approximator.set_function(approximation_function)
+        if state_dict_url is not None and state_dict_url != self.state_dict_url:
+            self.load_state_dict_and_register_url(state_dict_url)
+
     def load_state_dict_and_register_url(self, url: str) -> None:
         """
         A function that loads state dict from a url and sets url to self.state_dict_url
@@ -216,8 +281,9 @@ class DmxModule(
             **kwargs (Optional[Dict]): variable length of kwargs
         """
         _dtype, _device = input.dtype, input.device
-        if hasattr(self, "weight") and self.weight != None:
-            _device = self.weight.device
+        _w = getattr(self, "weight", None)
+        if _w is not None:
+            _device = _w.device
         if self.smoothquant is not None:
             if self.smoothquant.dynamic[0] == 1 or self.smoothquant.calibrating:
                 self.update_smoothquant_scale(input)
@@ -240,9 +306,9 @@ class DmxModule(
             x.to(_device) if isinstance(x, torch.Tensor) and x.device != _device else x
             for x in args
         )
-        for k in kwags.keys():
-            if isinstance(kwags[k], Tensor) and kwags[k].device != _device:
-                kwags[k] = kwags[k].to(_device)
+        for k, v in kwags.items():
+            if isinstance(v, Tensor) and v.device != _device:
+                kwags[k] = v.to(_device)
         return _input, args, kwags
 
     def update_params_with_raw(self, raw: torch.nn.Module) -> None:
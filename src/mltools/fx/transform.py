@@ -1,3 +1,5 @@
+import copy
+import weakref
 import torch
 import torch.nn as nn
 
@@ -8,6 +10,73 @@ from mltools.fx.transformer.utils import dmx_aware_mapping
 from torch.fx import GraphModule
 from typing import Any, Dict, List, Optional, Union
 
+# traced graphs of root modules, keyed by module instance and then by tracing inputs
+_TRACE_CACHE: "weakref.WeakKeyDictionary[torch.nn.Module, Dict[tuple, tuple]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# root attributes not carried over to the transformed module; the forward closures and the cached
+# dmx module list of DmxModel reference the previous transformed module, copying them would keep
+# every earlier trace alive
+_UNCOPIED_ATTRS = frozenset(("forward", "_forward", "_dmx_module_list"))
+
+
+def _trace_cache_key(
+    root: torch.nn.Module,
+    hf: bool,
+    input_names: Optional[List[str]],
+    concrete_args: Optional[Dict[str, Any]],
+) -> Optional[tuple]:
+    # NOTE: python control flow at trace time may depend on mode and config, e.g. gradient checkpointing and use_cache
+    _config = getattr(root, "config", None)
+    try:
+        _config = _config.to_json_string() if hasattr(_config, "to_json_string") else None
+    except (TypeError, ValueError):  # non-serializable config attributes
+        return None
+    key = (
+        hf,
+        tuple(input_names) if input_names is not None else None,
+        tuple(sorted(concrete_args.items())) if concrete_args else (),
+        root.training,
+        _config,
+    )
+    try:
+        hash(key)
+    except TypeError:  # unhashable concrete args, e.g. pytree specs
+        return None
+    return key
+
+
+def _traced(
+    root: torch.nn.Module,
+    concrete_args: Optional[Dict[str, Any]] = None,
+    hf: bool = False,
+    input_names: Optional[List[str]] = None,
+):
+    r"""
+    Traces root, reusing the graph of a previous trace of the same module with the same inputs.
+    A fresh GraphModule is built around a copy of the cached graph, so that parameters stay bound to root.
+    NOTE: besides the tracing inputs, the training mode and the (HF) config of root, the traced graph is assumed
+    to be independent of module and config states, and the module hierarchy of root not to be altered between traces.
+    """
+    key = _trace_cache_key(root, hf, input_names, concrete_args)
+    cached = _TRACE_CACHE.get(root, {}).get(key) if key is not None else None
+    if cached is not None:
+        graph, node_name_to_scope = cached
+        return GraphModule(root, copy.deepcopy(graph)), node_name_to_scope
+    # NOTE: tracing is kept serial on purpose, fx patches torch functions and module.__call__
+    # process-wide for the duration of a trace, hence concurrent traces in threads are not safe
+    if hf:
+        gm, tracer = hf_symbolic_trace(root, input_names, concrete_args=concrete_args)
+    else:
+        gm, tracer = symbolic_trace(root, concrete_args)
+    if key is not None:
+        _TRACE_CACHE.setdefault(root, {})[key] = (
+            copy.deepcopy(gm.graph),
+            tracer.node_name_to_scope,
+        )
+    return gm, tracer.node_name_to_scope
+
 
 def substitute_transform(
     root: torch.nn.Module,
@@ -31,15 +100,12 @@ def substitute_transform(
         transformed = dmx_aware_mapping[mod_type].from_raw(root)
         return transformed
     root = remove_new_forward(root)
-    if hf:
-        gm, tracer = hf_symbolic_trace(root, input_names, concrete_args=concrete_args)
-    else:
-        gm, tracer = symbolic_trace(root, concrete_args)
-    transformer = DMXAwareTransformer(gm, tracer.node_name_to_scope)
+    gm, node_name_to_scope = _traced(root, concrete_args, hf, input_names)
+    transformer = DMXAwareTransformer(gm, node_name_to_scope)
     transformed = transformer.transform()
     # Copy over all object attributes (i.e. config files)
     for key, val in root.__dict__.items():
-        if key not in transformed.__dict__ and key != "forward":
+        if key not in transformed.__dict__ and key not in _UNCOPIED_ATTRS:
             transformed.__dict__[key] = val
     return transformed
 
@@ -59,9 +125,8 @@ def qDq_transform(
         transformed model
     """
     transformer = QdQTransformer(root)
-    transformed = transformer.transform()
-    transformed.recompile()
-    return transformed
+    # NOTE: constructing the GraphModule in transform() already generates its code
+    return transformer.transform()
 
 
 def remove_new_forward(model):
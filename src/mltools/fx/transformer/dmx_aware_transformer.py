@@ -1,11 +1,74 @@
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, FrozenSet, Tuple
+import torch
 import torch.fx as fx
 from torch.fx.node import Argument, Target
 from torch.fx.proxy import Proxy
 
 import inspect
+import re
 from .utils import *
 
+# NOTE: memoizes "<module>.<qualname>" keys into dmx_aware_mapping per module class
+_type_key_cache: Dict[type, str] = {}
+# NOTE: memoizes the __init__ kwarg names of dmx_aware_functional_mappings classes per node key
+_init_kw_cache: Dict[str, FrozenSet[str]] = {}
+
+_MATMUL_KEYS = frozenset(
+    (repr(torch.matmul), repr(torch.bmm), "<built-in function matmul>")
+)
+# NOTE: name builders of functional nodes that are named after their scope rather than their target
+_SPECIAL_NAMERS: Dict[str, Callable[[str], str]] = {
+    "<built-in function add>": lambda scope: scope + ".resadd",
+    "<built-in function mul>": lambda scope: scope + ".mul",
+    **{k: (lambda scope: scope + ".matmul") for k in _MATMUL_KEYS},
+}
+# NOTE: functional nodes that are substituted only if both operands are produced in the graph
+_PROXY_GUARDED_KEYS = frozenset(("<built-in function add>", "<built-in function mul>"))
+_TRAIL_RE = re.compile(r"_(\d+)$")
+_PROXY_OPS = frozenset(("call_module", "call_function", "call_method", "placeholder"))
+
+
+def _type_key(t: type) -> str:
+    r"""
+    Returns the dmx_aware_mapping key of a module class
+    """
+    node_key = _type_key_cache.get(t)
+    if node_key is None:
+        node_key = _type_key_cache.setdefault(t, f"{t.__module__}.{t.__name__}")
+    return node_key
+
+
+def _both_proxy_ops(a, b):
+    r"""
+    Returns True if both operands are proxies of nodes that produce tensors in the graph
+    """
+    return (
+        isinstance(a, Proxy)
+        and isinstance(b, Proxy)
+        and a.node.op in _PROXY_OPS
+        and b.node.op in _PROXY_OPS
+    )
+
+
+def _partition_and_process(
+    args: Tuple[Argument, ...], kwargs: Dict[str, Any], accepted: FrozenSet[str]
+):
+    r"""
+    Splits kwargs into those accepted by a module's __init__ and those passed on to its forward,
+    and removes the proxy wrappers of args and forward kwargs, in a single pass over each
+
+    Returns:
+        A tuple of init kwargs, processed args and processed forward kwargs
+    """
+    initkwargs, newkwargs = {}, {}
+    for k, v in kwargs.items():
+        if k in accepted:
+            initkwargs[k] = v
+        else:
+            newkwargs[k] = v.node if isinstance(v, Proxy) else v
+    newargs = tuple(a.node if isinstance(a, Proxy) else a for a in args)
+    return initkwargs, newargs, newkwargs
+
 
 class DMXAwareTransformer(fx.Transformer):
     """
@@ -21,10 +84,33 @@ class DMXAwareTransformer(fx.Transformer):
         node_name_to_scope (dict): A dictionary storing the mapping between node names and scopes
     """
 
+    # NOTE: fx.Transformer instances still carry a __dict__, slots speed up the attributes used per node
+    __slots__ = (
+        "module",
+        "node_name_to_scope",
+        "_ns",
+        "_add_submod",
+        "_create_node",
+        "_scope_prefix_cache",
+    )
+
     def __init__(self, module: fx.GraphModule, node_name_to_scope: dict):
         super().__init__(module)
         self.module = module
         self.node_name_to_scope = node_name_to_scope
+        # NOTE: new_graph is created once by fx.Transformer and not rebuilt during transform()
+        self._ns = self.new_graph._graph_namespace
+        self._add_submod = self.module.add_submodule
+        self._create_node = self.new_graph.create_node
+        self._scope_prefix_cache: Dict[str, str] = {}
+
+    def _scope_prefix(self, scope: str) -> str:
+        prefix = self._scope_prefix_cache.get(scope)
+        if prefix is None:
+            prefix = self._scope_prefix_cache.setdefault(
+                scope, scope + "." if scope else ""
+            )
+        return prefix
 
     def call_module(
         self, target: "Target", args: Tuple[Argument, ...], kwargs: Dict[str, Any]
@@ -45,14 +131,15 @@ class DMXAwareTransformer(fx.Transformer):
         """
         assert isinstance(target, str)
         curr_mod = self.module.get_submodule(target)
-        node_key = type(curr_mod).__module__ + "." + type(curr_mod).__name__
-        if node_key not in dmx_aware_mapping:
+        dmx_cls = dmx_aware_mapping.get(_type_key(type(curr_mod)))
+        if dmx_cls is None:
             return super().call_module(target, args, kwargs)
-        self.module.add_submodule(
-            target, dmx_aware_mapping[node_key].from_raw(curr_mod)
-        )
-        new_node = self.new_graph.create_node(
-            "call_module", target, args=(args[0].node,)
+        self._add_submod(target, dmx_cls.from_raw(curr_mod))
+        new_node = self._create_node(
+            "call_module",
+            target,
+            args=process_args(args),
+            kwargs=process_kwargs(kwargs),
         )
         return Proxy(new_node, self.tracer)
 
@@ -63,23 +150,24 @@ class DMXAwareTransformer(fx.Transformer):
             candidate = target
             curr_name = get_name_for_func_nodes(
                 target,
-                self.new_graph._graph_namespace._used_names,
-                self.new_graph._graph_namespace._base_count,
+                self._ns._used_names,
+                self._ns._base_count,
             )
             scope, _ = self.node_name_to_scope[curr_name]
-            new_name = scope + "." + candidate if scope != "" else candidate
+            new_name = self._scope_prefix(scope) + candidate
             # If new name is not candidate, need to add candidate to used names,
             # otherwise next call_method will use the same candidate. (create_name is also called in create_node)
             if new_name != candidate:
-                self.new_graph._graph_namespace.create_name(candidate, None)
+                self._ns.create_name(candidate, None)
 
-            self.module.add_submodule(new_name, dmx.nn.BAddBMM())
-            new_node = self.new_graph.create_node(
+            self._add_submod(new_name, dmx.nn.BAddBMM())
+            new_node = self._create_node(
                 "call_module",
                 new_name,
             )
-            new_node.args = process_args(args)
-            new_node.kwargs = process_kwargs(kwargs)
+            _, new_node.args, new_node.kwargs = _partition_and_process(
+                args, kwargs, frozenset()
+            )
             return Proxy(new_node, self.tracer)
         else:
             return super().call_method(target, args, kwargs)
@@ -87,17 +175,14 @@ class DMXAwareTransformer(fx.Transformer):
     def create_unique_name_in_scope(self, cand_name):
         curr_name = get_name_for_func_nodes(
             cand_name,
-            self.new_graph._graph_namespace._used_names,
-            self.new_graph._graph_namespace._base_count,
+            self._ns._used_names,
+            self._ns._base_count,
         )
         # replace "_" with "." exit for last "_" if new_name ends with digit
-        new_name = curr_name.replace("_", ".")
-        new_name = (
-            new_name[: new_name.rfind(".")] + "_" + new_name[new_name.rfind(".") + 1 :]
-            if new_name[-1].isdigit()
-            else new_name
-        )
-        return new_name
+        m = _TRAIL_RE.search(curr_name)
+        if m:
+            return f"{curr_name[: m.start()].replace('_', '.')}_{m.group(1)}"
+        return curr_name.replace("_", ".")
 
     def call_function(
         self, target: "Target", args: Tuple[Argument, ...], kwargs: Dict[str, Any]
@@ -117,73 +202,46 @@ class DMXAwareTransformer(fx.Transformer):
         """
         assert callable(target)
         node_key = str(target)
-        if node_key not in dmx_aware_functional_mappings:
+        dmx_cls = dmx_aware_functional_mappings.get(node_key)
+        if dmx_cls is None:
+            return super().call_function(target, args, kwargs)
+
+        # add and mul are only replaced between two graph-produced operands, e.g. not for scaling by constants
+        if node_key in _PROXY_GUARDED_KEYS and not _both_proxy_ops(args[0], args[1]):
             return super().call_function(target, args, kwargs)
 
         candidate = self.new_graph._target_to_str(target)
         curr_name = get_name_for_func_nodes(
             candidate,
-            self.new_graph._graph_namespace._used_names,
-            self.new_graph._graph_namespace._base_count,
+            self._ns._used_names,
+            self._ns._base_count,
         )
 
         curr_target, curr_type = self.node_name_to_scope[curr_name]
-        if node_key == "<built-in function add>":
-            if (
-                isinstance(args[0], Proxy)
-                and isinstance(args[1], Proxy)
-                and args[0].node.op
-                in ["call_module", "call_function", "call_method", "placeholder"]
-                and args[1].node.op
-                in ["call_module", "call_function", "call_method", "placeholder"]
-            ):
-                cand_name = curr_target + ".resadd"
-                new_name = self.create_unique_name_in_scope(cand_name)
-            else:
-                return super().call_function(target, args, kwargs)
-        elif node_key in "<built-in function mul>":
-            if (
-                isinstance(args[0], Proxy)
-                and isinstance(args[1], Proxy)
-                and args[0].node.op
-                in ["call_module", "call_function", "call_method", "placeholder"]
-                and args[1].node.op
-                in ["call_module", "call_function", "call_method", "placeholder"]
-            ):
-                cand_name = curr_target + ".mul"
-                new_name = self.create_unique_name_in_scope(cand_name)
-            else:
-                return super().call_function(target, args, kwargs)
-        elif node_key in [
-            repr(eval("torch.matmul")),
-            repr(eval("torch.bmm")),
-            "<built-in function matmul>",
-        ]:
-            cand_name = curr_target + ".matmul"
-            new_name = self.create_unique_name_in_scope(cand_name)
+        namer = _SPECIAL_NAMERS.get(node_key)
+        if namer is not None:
+            new_name = self.create_unique_name_in_scope(namer(curr_target))
         else:
-            new_name = curr_target + "." + candidate if curr_target != "" else candidate
+            new_name = self._scope_prefix(curr_target) + candidate
         # If new name is not candidate, need to add candidate to used names,
         # otherwise next call_function will use the same candidate. (create_name is also called in create_node)
         if new_name != candidate:
-            self.new_graph._graph_namespace.create_name(candidate, None)
+            self._ns.create_name(candidate, None)
         # find out what kwargs to pass in to new module init, which kwargs to pass into forward function of module
-        empty_mod = dmx_aware_functional_mappings[node_key]()
-        accepted_kwarg_keys = inspect.signature(empty_mod.__init__).parameters.keys()
-        initkwargs = {}
-        newkwargs = {}
-        for key, value in kwargs.items():
-            if key in accepted_kwarg_keys:
-                initkwargs[key] = value
-            else:
-                newkwargs[key] = value
-        self.module.add_submodule(
-            new_name, dmx_aware_functional_mappings[node_key](**initkwargs)
+        accepted_kwarg_keys = _init_kw_cache.get(node_key)
+        if accepted_kwarg_keys is None:
+            accepted_kwarg_keys = _init_kw_cache.setdefault(
+                node_key,
+                frozenset(inspect.signature(dmx_cls.__init__).parameters) - {"self"},
+            )
+        initkwargs, newargs, newkwargs = _partition_and_process(
+            args, kwargs, accepted_kwarg_keys
         )
-        new_node = self.new_graph.create_node(
+        self._add_submod(new_name, dmx_cls(**initkwargs))
+        new_node = self._create_node(
             "call_module",
             new_name,
         )
-        new_node.args = process_args(args)
-        new_node.kwargs = process_kwargs(newkwargs)
+        new_node.args = newargs
+        new_node.kwargs = newkwargs
         return Proxy(new_node, self.tracer)
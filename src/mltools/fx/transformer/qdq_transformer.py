@@ -15,6 +15,14 @@ from mltools.fx.transformer.utils import process_args
 
 from .utils import dmx_aware_mapping, dmx_aware_functional_mappings
 
+_DMX_MODULE_TYPES = tuple(
+    set(
+        itertools.chain(
+            dmx_aware_mapping.values(), dmx_aware_functional_mappings.values()
+        )
+    )
+)
+
 
 class QdQTransformer(fx.Transformer):
     def __init__(self, module: fx.GraphModule, scopeDict: dict = None, cfg=None):
@@ -84,10 +92,7 @@ class QdQTransformer(fx.Transformer):
         submod = self.fetch_attr(target)
         curr_mod = submod
 
-        dmx_module_targets = itertools.chain(dmx_aware_mapping.values(),
-                                             dmx_aware_functional_mappings.values())
-        if any(map(lambda m: isinstance(curr_mod, m), dmx_module_targets)):
-            inv_dmx_aware_mapping = {str(v): k for k, v in dmx_aware_mapping.items()}
+        if isinstance(curr_mod, _DMX_MODULE_TYPES):
             subgraph = curr_mod.to_compiler_graph()
             processed_args = process_args(args)
             subgraph_input_nodes = filter(lambda n: n.op == "placeholder", list(subgraph.nodes))
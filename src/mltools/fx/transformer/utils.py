@@ -95,6 +95,12 @@ def process_kwargs(kwargs):
     return new_kwargs
 
 
+_illegal_char_regex = re.compile("[^0-9a-zA-Z_]+")
+_name_suffix_regex = re.compile(r"(.*)_(\d+)$")
+# NOTE: _Namespace._is_illegal_name is stateless, one instance serves every call
+_namespace = fx.graph._Namespace()
+
+
 def get_name_for_func_nodes(
     candidate: str, used_names: Set[str], base_count: Dict[str, int]
 ):
@@ -105,17 +111,14 @@ def get_name_for_func_nodes(
         used_names (Set[str]): A Set of names already used for nodes
         base_count (Dict[str, int]): A dict counting number of names sharing the same candidate base
     """
-    illegal_char_regex = re.compile("[^0-9a-zA-Z_]+")
-    name_suffix_regex = re.compile(r"(.*)_(\d+)$")
-
-    candidate = illegal_char_regex.sub("_", candidate)
+    candidate = _illegal_char_regex.sub("_", candidate)
     if not candidate:
         candidate = "_unnamed"
 
     if candidate[0].isdigit():
         candidate = f"_{candidate}"
 
-    match = name_suffix_regex.match(candidate)
+    match = _name_suffix_regex.match(candidate)
     if match is None:
         base = candidate
         num = None
@@ -127,9 +130,7 @@ def get_name_for_func_nodes(
     if not num:
         num = base_count[base]
 
-    while candidate in used_names or fx.graph._Namespace()._is_illegal_name(
-        candidate, None
-    ):
+    while candidate in used_names or _namespace._is_illegal_name(candidate, None):
         num += 1
         candidate = f"{base}_{num}"
     return candidate
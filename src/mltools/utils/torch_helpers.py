@@ -13,3 +13,5 @@ def transform_submodule(model, key, fn):
     parent, target_name, target = _get_submodule(model, key)
     transformed_target = fn(target)
     _set_submodule(parent, target_name, transformed_target)
+    if hasattr(model, "_invalidate_dmx_module_list"):  # NOTE: DmxModelMixin caches its dmx modules
+        model._invalidate_dmx_module_list()
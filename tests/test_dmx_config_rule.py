@@ -0,0 +1,106 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from mltools import dmx
+
+RANDOM_SEED = 0
+
+torch.manual_seed(RANDOM_SEED)
+
+
+class Lenet5(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.conv1 = nn.Conv2d(1, 6, 5)
+        self.conv2 = nn.Conv2d(6, 16, 5)
+        self.fc1 = nn.Linear(16 * 5 * 5, 120)
+        self.fc2 = nn.Linear(120, 84)
+        self.fc3 = nn.Linear(84, 10)
+        self.mp1 = nn.MaxPool2d((2, 2))
+        self.mp2 = nn.MaxPool2d(2)
+
+    def forward(self, x):
+        x = self.mp1(F.relu(self.conv1(x)))
+        x = self.mp2(F.relu(self.conv2(x)))
+        x = torch.flatten(x, 1)
+        x = F.relu(self.fc1(x))
+        x = F.relu(self.fc2(x))
+        x = self.fc3(x)
+        return x
+
+
+fc_quantize_input = dmx.DmxConfigRule(
+    module_types=(dmx.nn.Linear,),
+    name_re=r".*fc[12]$",
+    module_config=dmx.DmxModuleConfig(input_format=dmx.format.BFP16_64_LD),
+)
+conv_quantize_input = dmx.DmxConfigRule(
+    module_types=(dmx.nn.Conv2d,),
+    module_config=dmx.DmxModuleConfig(input_format=dmx.format.BFP16_64_FD),
+)
+
+
+def _create_config():
+    return dmx.DmxConfig(
+        {
+            "conv1": dict(instance=dmx.nn.Conv2d, input_format=dmx.format.FLOAT16),
+            "fc1": dict(instance=dmx.nn.Linear, input_format=dmx.format.FLOAT16),
+            "fc2": dict(instance=dmx.nn.Linear, input_format=dmx.format.FLOAT16),
+            "fc3": dict(instance=dmx.nn.Linear, input_format=dmx.format.FLOAT16),
+        }
+    )
+
+
+def _create_model():
+    _model = dmx.DmxModel.from_torch(Lenet5())
+    with torch.no_grad():
+        _model(torch.randn(1, 1, 32, 32))
+    return _model
+
+
+def test_apply_to_config():
+    config = _create_config()
+    fc_quantize_input.apply_to(config)
+    assert config["conv1"]["input_format"] is dmx.format.FLOAT16
+    assert config["fc1"]["input_format"] is dmx.format.BFP16_64_LD
+    assert config["fc2"]["input_format"] is dmx.format.BFP16_64_LD
+    assert config["fc3"]["input_format"] is dmx.format.FLOAT16
+
+
+def test_apply_rules_to_config():
+    config = _create_config()
+    fc_quantize_input.apply_to(config)
+    conv_quantize_input.apply_to(config)
+    assert _create_config().apply_rules(fc_quantize_input, conv_quantize_input) == config
+
+
+def test_apply_to_model():
+    model = _create_model()
+    assert sorted(fc_quantize_input.names_in(model)) == ["_gm.fc1", "_gm.fc2"]
+    baseline_config = model.dmx_config
+    fc_quantize_input.apply_to(model)
+    config = model.dmx_config
+    for n in config.module_names:
+        if n in ("_gm.fc1", "_gm.fc2"):
+            assert config[n]["input_format"] is dmx.format.BFP16_64_LD
+        else:
+            assert config[n] == baseline_config[n]
+
+
+def test_module_format_survives_retrace():
+    model = _create_model()
+    dict(model.named_dmx_modules())["_gm.fc3"].configure(
+        dmx.DmxModuleConfig(input_format=dmx.format.BFP16_64_LD)
+    )
+    with torch.no_grad():
+        model(x=torch.randn(1, 1, 32, 32))  # NOTE: a change of signature triggers retracing
+    assert model.dmx_config["_gm.fc3"]["input_format"] is dmx.format.BFP16_64_LD
+
+
+def test_dmx_config_reflects_module_changes():
+    model = _create_model()
+    model.dmx_config
+    dict(model.named_dmx_modules())["_gm.fc3"].configure(
+        dmx.DmxModuleConfig(input_format=dmx.format.BFP16_64_LD)
+    )
+    assert model.dmx_config["_gm.fc3"]["input_format"] is dmx.format.BFP16_64_LD
@@ -0,0 +1,130 @@
+import gc
+import weakref
+import pytest
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from mltools import dmx, utils
+
+RANDOM_SEED = 0
+
+torch.manual_seed(RANDOM_SEED)
+
+
+class Lenet5(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.conv1 = nn.Conv2d(1, 6, 5)
+        self.conv2 = nn.Conv2d(6, 16, 5)
+        self.fc1 = nn.Linear(16 * 5 * 5, 120)
+        self.fc2 = nn.Linear(120, 84)
+        self.fc3 = nn.Linear(84, 10)
+        self.mp1 = nn.MaxPool2d((2, 2))
+        self.mp2 = nn.MaxPool2d(2)
+
+    def forward(self, x):
+        x = self.mp1(F.relu(self.conv1(x)))
+        x = self.mp2(F.relu(self.conv2(x)))
+        x = torch.flatten(x, 1)
+        x = F.relu(self.fc1(x))
+        x = F.relu(self.fc2(x))
+        x = self.fc3(x)
+        return x
+
+
+class Classifier(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.fc = nn.Linear(64, 64)
+
+    def forward(self, x):
+        return F.softmax(self.fc(x), dim=-1)
+
+
+def _create_model():
+    _model = dmx.DmxModel.from_torch(Lenet5())
+    with torch.no_grad():
+        _model(torch.randn(1, 1, 32, 32))
+    return _model
+
+
+def test_retrace_releases_previous_graph_module():
+    model = _create_model()
+    first_gm = weakref.ref(model._gm)
+    with torch.no_grad():
+        # NOTE: changes of signature trigger retracing
+        model(x=torch.randn(1, 1, 32, 32))
+        model(torch.randn(1, 1, 32, 32))
+    gc.collect()
+    assert model._gm is not None
+    assert first_gm() is None
+
+
+def test_retrace_refreshes_dmx_module_list():
+    model = _create_model()
+    first_modules = [m for _, m in model.named_dmx_modules()]
+    with torch.no_grad():
+        model(x=torch.randn(1, 1, 32, 32))  # NOTE: a change of signature triggers retracing
+    modules = dict(model.named_dmx_modules())
+    assert "_dmx_module_list" not in model._gm.__dict__
+    assert all(m is model.get_submodule(n) for n, m in modules.items())
+    assert not any(m in first_modules for m in modules.values())
+
+
+def test_transform_submodule_refreshes_dmx_module_list():
+    model = _create_model()
+    assert "_gm.fc3" in dict(model.named_dmx_modules())
+    utils.transform_submodule(model, "_gm.fc3", lambda _: nn.Identity())
+    assert "_gm.fc3" not in dict(model.named_dmx_modules())
+
+
+def _create_classifier():
+    _model = dmx.DmxModel.from_torch(Classifier())
+    with torch.no_grad():
+        _model(torch.randn(2, 64))
+    return _model
+
+
+def _reconfigure(model):
+    model.configure(
+        None,
+        dmx.DmxConfigRule(
+            module_types=(dmx.nn.Linear,),
+            module_config=dict(
+                input_format=dmx.format.BFP16_64_LD,
+                weight_format=dmx.format.BFP16_64_LD,
+                smoothquant_scale_format=dmx.format.FLOAT16,
+            ),
+        ),
+        dmx.DmxConfigRule(
+            module_types=(dmx.nn.Softmax,),
+            module_config=dict(
+                approximation_function=dmx.ApproximationFunction.from_shorthand(
+                    "SOFTMAX(poly2,float16)"
+                ),
+            ),
+        ),
+    )
+
+
+def test_keep_dmx_config_restores_formats():
+    model = _create_classifier()
+    baseline_config = model.dmx_config
+    with model.keep_dmx_config():
+        _reconfigure(model)
+        config = model.dmx_config
+        assert config["_gm.fc"]["smoothquant_scale_format"] is dmx.format.FLOAT16
+        assert config["_gm.softmax"]["approximation_function"] != (
+            baseline_config["_gm.softmax"]["approximation_function"]
+        )
+    assert model.dmx_config == baseline_config
+
+
+def test_keep_dmx_config_restores_formats_on_error():
+    model = _create_classifier()
+    baseline_config = model.dmx_config
+    with pytest.raises(RuntimeError):
+        with model.keep_dmx_config():
+            _reconfigure(model)
+            raise RuntimeError
+    assert model.dmx_config == baseline_config
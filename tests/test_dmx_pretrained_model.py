@@ -0,0 +1,77 @@
+import inspect
+import pytest
+import torch
+import transformers
+from mltools.dmx import hf
+
+RANDOM_SEED = 0
+
+torch.manual_seed(RANDOM_SEED)
+
+
+class DmxGPT2LMHeadModel(hf.DmxPreTrainedModel, transformers.GPT2LMHeadModel):
+    pass
+
+
+@pytest.fixture
+def pretrained_dir(tmp_path):
+    config = transformers.GPT2Config(n_layer=1, n_head=2, n_embd=8, vocab_size=16)
+    transformers.GPT2LMHeadModel(config).save_pretrained(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def transform_calls(monkeypatch):
+    # NOTE: records the modules handed to substitute_transform and leaves them as they are
+    calls = []
+
+    def _substitute_transform(root, hf=False):
+        calls.append(root)
+        return root
+
+    monkeypatch.setattr(hf, "substitute_transform", _substitute_transform)
+    return calls
+
+
+def test_from_pretrained_defers_transform(pretrained_dir, transform_calls):
+    model = DmxGPT2LMHeadModel.from_pretrained(pretrained_dir)
+    assert transform_calls == []
+    assert "forward" not in model.__dict__
+    assert "input_ids" in inspect.signature(model.forward).parameters
+
+
+def test_first_forward_transforms_once(pretrained_dir, transform_calls):
+    model = DmxGPT2LMHeadModel.from_pretrained(pretrained_dir)
+    input_ids = torch.tensor([[1, 2, 3]])
+    with torch.no_grad():
+        model(input_ids)
+        model(input_ids)
+    assert len(transform_calls) == 1
+    assert len(model._forward_pre_hooks) == 0
+
+
+def test_dmx_enable_before_forward(pretrained_dir, transform_calls):
+    model = DmxGPT2LMHeadModel.from_pretrained(pretrained_dir)
+    assert model.dmx_enable() is model
+    assert len(transform_calls) == 1
+    with torch.no_grad():
+        model(torch.tensor([[1, 2, 3]]))
+    model.dmx_enable()
+    assert len(transform_calls) == 1
+
+
+def test_failed_transform_is_retried(pretrained_dir, transform_calls, monkeypatch):
+    model = DmxGPT2LMHeadModel.from_pretrained(pretrained_dir)
+    _substitute_transform = hf.substitute_transform
+
+    def _failing_substitute_transform(root, hf=False):
+        raise RuntimeError("tracing failed")
+
+    monkeypatch.setattr(hf, "substitute_transform", _failing_substitute_transform)
+    input_ids = torch.tensor([[1, 2, 3]])
+    with pytest.raises(RuntimeError):
+        model(input_ids)
+    monkeypatch.setattr(hf, "substitute_transform", _substitute_transform)
+    with torch.no_grad():
+        model(input_ids)
+    assert len(transform_calls) == 1
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+from collections import Counter
 import torch
 from torch import fx, nn
 import torch.nn.functional as F
@@ -26,8 +27,9 @@ def test_qdq_attr():
     with gm.graph.inserting_before():
         qdq_attr(gm.graph, 'test_attr', 'SAME')
 
-    assert len(list(filter(lambda n: n.target == "test_attr", gm.graph.nodes))) == 1
-    assert len(list(filter(lambda n: n.target == "test_attr_scale", gm.graph.nodes))) == 1
-    assert len(list(filter(lambda n: n.target == "test_attr_zero_point", gm.graph.nodes))) == 1
-    assert len(list(filter(lambda n: n.target == torch.ops.dmx.quantize, gm.graph.nodes))) == 1
-    assert len(list(filter(lambda n: n.target == torch.ops.dmx.dequantize, gm.graph.nodes))) == 1
+    targets = Counter(n.target for n in gm.graph.nodes)
+    assert targets["test_attr"] == 1
+    assert targets["test_attr_scale"] == 1
+    assert targets["test_attr_zero_point"] == 1
+    assert targets[torch.ops.dmx.quantize] == 1
+    assert targets[torch.ops.dmx.dequantize] == 1